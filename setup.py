@@ -44,6 +44,7 @@ with open('README.rst') as file:
 requires = [
     'iperf3==0.1.11',
     'matplotlib==3.5.2',
+    'Pillow==9.1.1',
     'scipy==1.8.1',
     'libnl3==0.3.0',
     'pypubsub==4.0.3',
@@ -35,19 +35,21 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 ##################################################################################
 """
 
+import os
 import sys
 import argparse
 import logging
 import json
 import numpy
+from concurrent.futures import ProcessPoolExecutor
 
-from collections import defaultdict
 import numpy as np
 import matplotlib.cm as cm
 import matplotlib.pyplot as pp
+from matplotlib.figure import Figure
 from mpl_toolkits.axes_grid1 import make_axes_locatable
-from scipy.interpolate import Rbf
-from pylab import imread, imshow
+from scipy.interpolate import RBFInterpolator
+from PIL import Image
 from matplotlib.offsetbox import AnchoredText
 from matplotlib.patheffects import withStroke
 from matplotlib.font_manager import FontManager
@@ -59,6 +61,14 @@ FORMAT = "[%(asctime)s %(levelname)s] %(message)s"
 logging.basicConfig(level=logging.WARNING, format=FORMAT)
 logger = logging.getLogger()
 
+# Number of rendered heatmap pixels per interpolated grid point along each
+# axis; imshow() bilinearly upsamples the grid to the final resolution.
+GRID_OVERSAMPLE = 4
+
+# Number of grid points to evaluate the RBF interpolator at in one go; this
+# bounds the (points x survey points) kernel matrix built for each chunk.
+EVAL_CHUNK = 4096
+
 
 WIFI_CHANNELS = {
     # center frequency to (channel, bandwidth MHz)
@@ -127,6 +137,23 @@ WIFI_CHANNELS = {
     5825.0: (165, 20.0)
 }
 
+# WIFI_CHANNELS center frequencies (MHz) in ascending order, and the channel
+# number of each
+ALL_FREQS = np.array(sorted(WIFI_CHANNELS.keys()))
+CHANNEL_NUMBERS = np.array([WIFI_CHANNELS[x][0] for x in ALL_FREQS])
+
+# lookup table of integer frequency (MHz) to index in ALL_FREQS, or -1
+FREQ_INDEX_LUT = np.full(int(ALL_FREQS.max()) + 1, -1, dtype=np.int16)
+FREQ_INDEX_LUT[ALL_FREQS.astype(int)] = np.arange(len(ALL_FREQS))
+
+# CHANNEL_OVERLAP[i, j] is 1 if ALL_FREQS[j] is within the bandwidth of the
+# channel centered on ALL_FREQS[i]
+_bandwidths = np.array([WIFI_CHANNELS[x][1] for x in ALL_FREQS])
+CHANNEL_OVERLAP = (
+    (ALL_FREQS >= (ALL_FREQS - _bandwidths / 2.0).astype(int)[:, None]) &
+    (ALL_FREQS < (ALL_FREQS + _bandwidths / 2.0 + 1.0).astype(int)[:, None])
+).astype(np.float64)
+
 
 class HeatMapGenerator(object):
 
@@ -194,6 +221,16 @@ class HeatMapGenerator(object):
                 self.thresholds = json.loads(fh.read())
             logger.debug('Thresholds: %s', self.thresholds)
 
+    def __getstate__(self):
+        # Worker processes only plot; don't send them the raw survey data,
+        # the full-size floorplan (they draw _background) or the parent's
+        # figure.
+        state = self.__dict__.copy()
+        state['_data'] = None
+        state['_layout'] = None
+        state['_figure'] = None
+        return state
+
     def get_cmap(self, cname):
         multi_string = cname.split('//')
         if len(multi_string) == 2:
@@ -206,94 +243,279 @@ class HeatMapGenerator(object):
             interval = int(N/steps) if steps > 0 else 0
             for i in range(0,N,interval):
                 newcolors[i] = rgba
-            print(newcolors)
+            logger.debug('Stepped colormap colors: %s', newcolors)
             return ListedColormap(newcolors)
         else:
             return pp.get_cmap(cname)
 
     def load_data(self):
-        a = defaultdict(list)
+        """
+        Load the survey points into one float64 array per metric, plus a list
+        of AP labels. Metrics that are missing from some survey points only
+        contain the values that are present (and will therefore be skipped
+        when plotting); metrics missing from all points are omitted.
+        """
+        rows = self._data['survey_points']
+        n = len(rows)
+        a = {
+            k: np.full(n, np.nan) for k in ['x', 'y'] + list(self.graphs.keys())
+        }
+        ap = []
         check = set()
-        for row in self._data['survey_points']:
+        count = 0
+
+        def put(key, value):
+            a[key][count] = 0 if value is None else value
+
+        for row in rows:
             point = (row['x'], row['y'])
             if point in check:
                 logger.warning(f"Two overlapping datapoints found. Discarding one of them. point={point}")
                 continue
             check.add(point)
-            a['x'].append(row['x'])
-            a['y'].append(row['y'])
-            a['channel'].append(row['result']['channel'])
-            if 'tcp' in row['result']:
-                a['tcp_upload_Mbps'].append(
-                    row['result']['tcp']['received_Mbps']
-                )
-            if 'tcp-reverse' in row['result']:
-                a['tcp_download_Mbps'].append(
-                    row['result']['tcp-reverse']['received_Mbps']
-                )
-            if 'udp' in row['result']:
-                a['udp_download_Mbps'].append(row['result']['udp']['Mbps'])
-                a['jitter_download'].append(row['result']['udp']['jitter_ms'])
-            if 'udp-reverse' in row['result']:
-                a['udp_upload_Mbps'].append(
-                    row['result']['udp-reverse']['Mbps'])
-                a['jitter_upload'].append(
-                    row['result']['udp-reverse']['jitter_ms'])
-            a['tx_power'].append(row['result']['tx_power'])
-            a['frequency'].append(row['result']['frequency']*1e-3)
-            if 'bitrate' in row['result']:
-                a['channel_bitrate'].append(row['result']['bitrate'])
-            a['signal_quality'].append(row['result']['signal_mbm']+130)
-            ap = self._ap_names.get(
-                row['result']['mac'].upper(),
-                row['result']['mac']
-            )
-            a['ap'].append(ap + ' ({0:.1f} GHz)'.format(1e-3*int(row['result']['frequency'])))
+            result = row['result']
+            put('x', row['x'])
+            put('y', row['y'])
+            put('channel', result['channel'])
+            if 'tcp' in result:
+                put('tcp_upload_Mbps', result['tcp']['received_Mbps'])
+            if 'tcp-reverse' in result:
+                put('tcp_download_Mbps', result['tcp-reverse']['received_Mbps'])
+            if 'udp' in result:
+                udp = result['udp']
+                put('udp_download_Mbps', udp['Mbps'])
+                put('jitter_download', udp['jitter_ms'])
+            if 'udp-reverse' in result:
+                udp = result['udp-reverse']
+                put('udp_upload_Mbps', udp['Mbps'])
+                put('jitter_upload', udp['jitter_ms'])
+            put('tx_power', result['tx_power'])
+            put('frequency', result['frequency']*1e-3)
+            if 'bitrate' in result:
+                put('channel_bitrate', result['bitrate'])
+            put('signal_quality', result['signal_mbm']+130)
+            mac = result['mac']
+            name = self._ap_names.get(mac.upper(), mac)
+            ap.append(name + ' ({0:.1f} GHz)'.format(1e-3*int(result['frequency'])))
+            count += 1
+        for k in list(a.keys()):
+            values = a[k][:count]
+            present = ~np.isnan(values)
+            if not present.any():
+                del a[k]
+            elif present.all():
+                a[k] = values
+            else:
+                a[k] = values[present]
+        a['ap'] = ap
         return a
 
     def _load_image(self):
-        self._layout = imread(self._image_path)
-        self._image_width = len(self._layout[0])
-        self._image_height = len(self._layout) - 1
+        with Image.open(self._image_path) as img:
+            # survey coordinates are in pixels of the full-size image
+            self._image_width, self._image_height = img.size
+            # let JPEGs decode straight to (no less than) the rendered size
+            scale = self._plot_fraction()
+            img.draft('RGB', (
+                int(self._image_width * scale), int(self._image_height * scale)
+            ))
+            if img.mode not in ('RGB', 'RGBA'):
+                img = img.convert('RGBA')
+            self._layout = np.asarray(img)
         self._corners = [
             (0, 0), (0, self._image_height),
             (self._image_width, 0), (self._image_width, self._image_height)
         ]
         logger.debug(
-            'Loaded image with width=%d height=%d',
-            self._image_width, self._image_height
+            'Loaded image with width=%d height=%d (decoded at %s)',
+            self._image_width, self._image_height, self._layout.shape
         )
 
     def generate(self):
         self._load_image()
         a = self.load_data()
-        for x, y in self._corners:
-            a['x'].append(x)
-            a['y'].append(y)
-            for k in a.keys():
-                if k in ['x', 'y', 'ap']:
-                    continue
-                a['ap'].append(None)
-                a[k] = [0 if x is None else x for x in a[k]]
-                a[k].append(min(a[k]))
+        a = self._pad_corners(a)
+        self._background = self._resample_layout()
+        # Plot on plain Figures rather than through pyplot, so that no GUI
+        # backend state exists when the plotting processes are forked.
+        self._figure = Figure(
+            figsize=(self._image_width / 300, self._image_height / 300)
+        )
         self._channel_graphs()
-        num_x = int(self._image_width / 4)
+        self._heatmaps(a)
+
+    def _pad_corners(self, a):
+        """
+        Append the image corners to the survey data in ``a``, each with the
+        minimum value of every metric, so that the interpolation extends to
+        the whole image. Corners that are already survey points are skipped
+        (and removed from ``self._corners``), as the duplicate point would
+        make the RBF system singular.
+        """
+        surveyed = set(zip(a['x'].tolist(), a['y'].tolist()))
+        self._corners = [c for c in self._corners if c not in surveyed]
+        corners = np.array(self._corners, dtype=np.float64).reshape((-1, 2))
+        for k in a.keys():
+            if k == 'ap':
+                continue
+            if k == 'x':
+                pad = corners[:, 0]
+            elif k == 'y':
+                pad = corners[:, 1]
+            else:
+                pad = np.full(len(corners), a[k].min())
+            a[k] = np.concatenate([a[k], pad])
+        return a
+
+    def _plot_fraction(self):
+        """
+        Return the fraction of the figure width taken up by the plot axes.
+        Plots are saved at 300 dpi with a figure size of image_size / 300
+        inches, so this is also the fraction of image pixels actually drawn.
+        """
+        return (
+            pp.rcParams['figure.subplot.right'] -
+            pp.rcParams['figure.subplot.left']
+        )
+
+    def _resample_layout(self):
+        """
+        Downsample the floorplan once, with Pillow, to the size of the plot
+        axes, which is an upper bound on the size it is drawn at. Each plot
+        then only has Matplotlib resample this smaller image rather than the
+        full-size one.
+        """
+        scale = self._plot_fraction()
+        rows, cols = self._layout.shape[:2]
+        size = (
+            int(round(self._image_width * scale)),
+            int(round(self._image_height * scale))
+        )
+        if size[0] >= cols or size[1] >= rows:
+            return self._layout
+        resampled = np.asarray(
+            Image.fromarray(self._layout).resize(size, Image.LANCZOS)
+        )
+        logger.debug(
+            'Resampled layout from %s to %s',
+            self._layout.shape, resampled.shape
+        )
+        return resampled
+
+    def _heatmaps(self, a):
+        # Interpolate one point per GRID_OVERSAMPLE pixels of the plot axes
+        # rather than of the whole image; with the default subplot params and
+        # GRID_OVERSAMPLE = 4 that is ~22% fewer points per axis than
+        # image_width / 4, or ~40% fewer grid points in total.
+        plot_width = self._image_width * self._plot_fraction()
+        num_x = int(plot_width / GRID_OVERSAMPLE)
         num_y = int(num_x / (self._image_width / self._image_height))
         x = np.linspace(0, self._image_width, num_x)
         y = np.linspace(0, self._image_height, num_y)
-        gx, gy = np.meshgrid(x, y)
-        gx, gy = gx.flatten(), gy.flatten()
-        for k, ptitle in self.graphs.items():
-            try:
-                self._plot(
-                    a, k, '%s - %s' % (self._title, ptitle), gx, gy, num_x, num_y
-                )
-            except:
-                logger.warning(
-                    "Cannot create %s plot: insufficient data",
-                    k,
-                    exc_info=True,
+        # row-major (num_y, num_x) grid points, built without materializing
+        # a dense meshgrid
+        eval_pts = np.empty((num_y * num_x, 2), dtype=np.float64)
+        eval_pts[:, 0] = np.tile(x, num_y)
+        eval_pts[:, 1] = np.repeat(y, num_x)
+        logger.debug(
+            'Evaluation grid: shape=%s C_CONTIGUOUS=%s',
+            eval_pts.shape, eval_pts.flags['C_CONTIGUOUS']
+        )
+        try:
+            interpolated = self._interpolate(a, eval_pts, num_x, num_y)
+        except:
+            logger.warning(
+                "Cannot interpolate survey data: insufficient data",
+                exc_info=True,
+            )
+            return
+        if not interpolated:
+            return
+        # each plot is independent; Matplotlib is not thread-safe, so render
+        # them in separate processes
+        jobs = {}
+        with ProcessPoolExecutor(
+            max_workers=min(len(interpolated), os.cpu_count() or 1),
+            initializer=_init_plot_worker, initargs=(
+                self, logger.level, logger.handlers[0].formatter._fmt
+            )
+        ) as executor:
+            for k, z in interpolated.items():
+                jobs[k] = executor.submit(
+                    _plot_worker, a, k,
+                    '%s - %s' % (self._title, self.graphs[k]),
+                    z, num_x, num_y
                 )
+            for k, job in jobs.items():
+                try:
+                    job.result()
+                except:
+                    logger.warning(
+                        "Cannot create %s plot: insufficient data",
+                        k,
+                        exc_info=True,
+                    )
+
+    def _plottable(self, a, key):
+        """
+        Return whether ``key`` has a value for every survey point in ``a``,
+        logging why not if it does not.
+        """
+        if key not in a:
+            logger.info("Skipping {} due to insufficient data".format(key))
+            return False
+        if not len(a['x']) == len(a['y']) == len(a[key]):
+            logger.info("Skipping {} because data has holes".format(key))
+            return False
+        return True
+
+    def _interpolate(self, a, eval_pts, num_x, num_y):
+        """
+        Interpolate every complete metric in ``a`` at ``eval_pts``, a
+        C-contiguous ``(num_x * num_y, 2)`` float64 array of grid points.
+
+        All metrics share the same measurement points, so a single
+        multi-output RBF is fitted and evaluated once rather than once per
+        graph. Metrics that are missing or have holes are left out.
+
+        :return: dict of metric key to interpolated ``(num_y, num_x)``
+          float32 array
+        :rtype: dict
+        """
+        keys = [k for k in self.graphs.keys() if self._plottable(a, k)]
+        if not keys:
+            return {}
+        logger.debug('Interpolating: %s', keys)
+        pts = np.column_stack([a['x'], a['y']])
+        values = np.column_stack([a[k] for k in keys])
+        z = _evaluate_rbf(pts, values, eval_pts)
+        # single precision is plenty for a colormap, and halves the size of
+        # the grids sent to the plotting processes
+        return {
+            k: np.ascontiguousarray(z[:, idx], dtype=np.float32).reshape(
+                (num_y, num_x)
+            )
+            for idx, k in enumerate(keys)
+        }
+
+    def _scan_qualities(self):
+        """
+        Return a 2-tuple of arrays with the frequency (MHz, int32) and
+        "quality" (float32) of every scan result across all survey points,
+        excluding ignored SSIDs.
+        """
+        ignore = frozenset(self._ignore_ssids)
+        freqs = []
+        quals = []
+        for row in self._data['survey_points']:
+            for scan in row['result']['scan_results'].values():
+                if scan['ssid'] in ignore:
+                    continue
+                freqs.append(scan['frequency'])
+                quals.append(scan['signal_mbm'])
+        freqs = (np.array(freqs, dtype=np.float64) / 1e6).astype(np.int32)
+        quals = np.array(quals, dtype=np.float32) + 100
+        return freqs, quals
 
     def _channel_to_signal(self):
         """
@@ -301,40 +523,28 @@ class HeatMapGenerator(object):
         for all APs seen on the given channel. This includes interpolation to
         overlapping channels based on channel width of each channel.
         """
-        # build a dict of frequency (GHz) to list of quality values
-        channels = defaultdict(list)
-        for row in self._data['survey_points']:
-            for scan in row['result']['scan_results']:
-                ssid = row['result']['scan_results'][scan]['ssid']
-                if ssid in self._ignore_ssids:
-                    continue
-                freq = row['result']['scan_results'][scan]['frequency'] / 1e6
-                channels[int(freq)].append(
-                    row['result']['scan_results'][scan]['signal_mbm'] + 100
-                )
-        # collapse down to dict of frequency (GHz) to average quality (float)
-        for freq in channels.keys():
-            channels[freq] = sum(channels[freq]) / len(channels[freq])
-        # build the full dict of frequency to quality for all channels
-        freq_qual = {x: 0.0 for x in WIFI_CHANNELS.keys()}
-        # then, update to account for full bandwidth of each channel
-        for freq, qual in channels.items():
-            freq_qual[freq] += qual
-            for spread in range(
-                int(freq - (WIFI_CHANNELS[freq][1] / 2.0)),
-                int(freq + (WIFI_CHANNELS[freq][1] / 2.0) + 1.0)
-            ):
-                if spread in freq_qual and spread != freq:
-                    freq_qual[spread] += qual
-        return {
-            WIFI_CHANNELS[x][0]: freq_qual[x] for x in freq_qual.keys()
-        }
+        freqs, quals = self._scan_qualities()
+        # index of each scan's frequency in ALL_FREQS
+        freq_idx = np.full(len(freqs), -1, dtype=np.intp)
+        in_range = (freqs >= 0) & (freqs < len(FREQ_INDEX_LUT))
+        freq_idx[in_range] = FREQ_INDEX_LUT[freqs[in_range]]
+        unknown = freq_idx < 0
+        if unknown.any():
+            raise KeyError(
+                'Unknown frequencies: %s' % np.unique(freqs[unknown]).tolist()
+            )
+        # average quality (float) of each frequency
+        sums = np.bincount(freq_idx, weights=quals, minlength=len(ALL_FREQS))
+        counts = np.bincount(freq_idx, minlength=len(ALL_FREQS))
+        means = sums / np.maximum(counts, 1)
+        # then, spread each to the full bandwidth of its channel
+        freq_qual = means @ CHANNEL_OVERLAP
+        return dict(zip(CHANNEL_NUMBERS.tolist(), freq_qual.tolist()))
 
     def _plot_channels(self, names, values, title, fname, ticks):
-        pp.rcParams['figure.figsize'] = (
-            self._image_width / 300, self._image_height / 300
-        )
-        fig, ax = pp.subplots()
+        fig = self._figure
+        fig.clf()
+        ax = fig.subplots()
         ax.set_title(title)
         ax.bar(names, values)
         ax.set_xlabel('Channel')
@@ -342,13 +552,13 @@ class HeatMapGenerator(object):
         ax.set_xticks(ticks)
         # ax.set_xticklabels(names)
         logger.info('Writing plot to: %s', fname)
-        pp.savefig(fname, dpi=300)
-        pp.close('all')
+        fig.savefig(fname, dpi=300)
 
     def _channel_graphs(self):
         try:
             c2s = self._channel_to_signal()
-        except KeyError:
+        except KeyError as ex:
+            logger.warning('Cannot create channel plots: %s', ex)
             return
         names24 = []
         values24 = []
@@ -389,53 +599,39 @@ class HeatMapGenerator(object):
         )
         return at
 
-    def _plot(self, a, key, title, gx, gy, num_x, num_y):
-        if key not in a:
-            logger.info("Skipping {} due to insufficient data".format(key))
-            return
-        if not len(a['x']) == len(a['y']) == len(a[key]):
-            logger.info("Skipping {} because data has holes".format(key))
-            return
+    def _plot(self, a, key, title, z, num_x, num_y):
         logger.debug('Plotting: %s', key)
-        pp.rcParams['figure.figsize'] = (
-            self._image_width / 300, self._image_height / 300
-        )
-        fig, ax = pp.subplots()
+        fig = self._figure
+        fig.clf()
+        ax = fig.subplots()
         ax.set_title(title)
         if 'min' in self.thresholds.get(key, {}):
             vmin = self.thresholds[key]['min']
             logger.debug('Using min threshold from thresholds: %s', vmin)
         else:
-            vmin = min(a[key])
+            vmin = a[key].min()
             logger.debug('Using calculated min threshold: %s', vmin)
         if 'max' in self.thresholds.get(key, {}):
             vmax = self.thresholds[key]['max']
             logger.debug('Using max threshold from thresholds: %s', vmax)
         else:
-            vmax = max(a[key])
+            vmax = a[key].max()
             logger.debug('Using calculated max threshold: %s', vmax)
         logger.info("{} has range [{},{}]".format(key, vmin, vmax))
-        # Interpolate the data only if there is something to interpolate
-        if vmin != vmax:
-            rbf = Rbf(
-                a['x'], a['y'], a[key], function='linear'
-            )
-            z = rbf(gx, gy)
-            z = z.reshape((num_y, num_x))
-        else:
+        # Use the interpolated data only if there is something to interpolate
+        if vmin == vmax:
             # Uniform array with the same color everywhere
             # (avoids interpolation artifacts)
-            z = numpy.ones((num_y, num_x))*vmin
+            z = numpy.full((num_y, num_x), vmin, dtype=np.float32)
         # Render the interpolated data to the plot
         ax.axis('off')
         # begin color mapping
         norm = matplotlib.colors.Normalize(vmin=vmin, vmax=vmax, clip=True)
-        mapper = cm.ScalarMappable(norm=norm, cmap=self._cmap)
         # end color mapping
         image = ax.imshow(
             z,
             extent=(0, self._image_width, self._image_height, 0),
-            alpha=0.5, zorder=100,
+            alpha=0.5, zorder=100, interpolation='bilinear',
             cmap=self._cmap, vmin=vmin, vmax=vmax
         )
 
@@ -452,19 +648,25 @@ class HeatMapGenerator(object):
             cbar.set_ticks([vmin])
 
         # Draw floorplan itself to the lowest layer with full opacity
-        ax.imshow(self._layout, interpolation='bicubic', zorder=1, alpha=1)
+        ax.imshow(
+            self._background, interpolation='bicubic', zorder=1, alpha=1,
+            extent=(
+                -0.5, self._image_width - 0.5, self._image_height - 0.5, -0.5
+            )
+        )
         labelsize = FontManager.get_default_size() * 0.4
         if(self._showpoints):
             # begin plotting points
-            for idx in range(0, len(a['x'])):
-                if (a['x'][idx], a['y'][idx]) in self._corners:
-                    continue
-                ax.plot(
-                    a['x'][idx], a['y'][idx], zorder=200,
-                    marker='o', markeredgecolor='black', markeredgewidth=1,
-                    markerfacecolor=mapper.to_rgba(a[key][idx]), markersize=6
-                )
-                if not self._hidebssid:
+            points = np.ones(len(a['x']), dtype=bool)
+            for cx, cy in self._corners:
+                points &= (a['x'] != cx) | (a['y'] != cy)
+            ax.scatter(
+                a['x'][points], a['y'][points], c=a[key][points],
+                cmap=self._cmap, norm=norm, zorder=200, marker='o',
+                edgecolors='black', linewidths=1, s=36
+            )
+            if not self._hidebssid:
+                for idx in np.flatnonzero(points):
                     ax.text(
                         a['x'][idx], a['y'][idx] - 30,
                         a['ap'][idx], fontsize=labelsize,
@@ -473,8 +675,47 @@ class HeatMapGenerator(object):
             # end plotting points
         fname = '%s_%s.png' % (key, self._title)
         logger.info('Writing plot to: %s', fname)
-        pp.savefig(fname, dpi=300)
-        pp.close('all')
+        fig.savefig(fname, dpi=300)
+
+
+def _evaluate_rbf(pts, values, eval_pts):
+    """
+    Fit a linear RBF interpolator to ``values`` at ``pts`` and evaluate it
+    at ``eval_pts``, :py:data:`EVAL_CHUNK` points at a time.
+    """
+    rbf = RBFInterpolator(pts, values, kernel='linear')
+    z = np.empty((len(eval_pts),) + np.shape(values)[1:])
+    for start in range(0, len(eval_pts), EVAL_CHUNK):
+        stop = start + EVAL_CHUNK
+        z[start:stop] = rbf(eval_pts[start:stop])
+    return z
+
+
+# HeatMapGenerator used by _plot_worker() in a worker process
+_worker_generator = None
+
+
+def _init_plot_worker(generator, level, format):
+    """
+    Initialize a heatmap worker process with the HeatMapGenerator to plot
+    with, a figure for it to reuse for every plot, and the parent's logging
+    level and format (spawned workers re-import this module, which resets
+    them to the defaults).
+    """
+    global _worker_generator
+    set_log_level_format(level, format)
+    generator._figure = Figure(
+        figsize=(generator._image_width / 300, generator._image_height / 300)
+    )
+    _worker_generator = generator
+
+
+def _plot_worker(a, key, title, z, num_x, num_y):
+    """
+    Render a single heatmap in a worker process; see
+    :py:meth:`HeatMapGenerator._plot`.
+    """
+    _worker_generator._plot(a, key, title, z, num_x, num_y)
 
 
 def parse_args(argv):
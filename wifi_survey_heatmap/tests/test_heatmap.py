@@ -0,0 +1,315 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/wifi-survey-heatmap>
+
+##################################################################################
+Copyright 2018 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of wifi-survey-heatmap, also known as wifi-survey-heatmap.
+
+    wifi-survey-heatmap is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    wifi-survey-heatmap is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with wifi-survey-heatmap.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+##################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/wifi-survey-heatmap> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+##################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+##################################################################################
+"""
+
+import json
+import logging
+import random
+from collections import defaultdict
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from wifi_survey_heatmap import heatmap
+from wifi_survey_heatmap.heatmap import HeatMapGenerator, WIFI_CHANNELS
+
+
+def survey_point(x, y, scans=None, **result):
+    res = {
+        'channel': 6,
+        'tx_power': 20,
+        'frequency': 2437,
+        'signal_mbm': -5000,
+        'mac': 'aa:bb:cc:dd:ee:ff',
+        'scan_results': scans or {},
+    }
+    res.update(result)
+    return {'x': x, 'y': y, 'result': res}
+
+
+def generator(tmp_path, points, ignore_ssids=[]):
+    fpath = tmp_path / 'survey.json'
+    fpath.write_text(json.dumps({'survey_points': points}))
+    g = HeatMapGenerator(
+        'floorplan.png', str(fpath), False, 'RdYlBu_r', None,
+        ignore_ssids=ignore_ssids
+    )
+    g._image_width = 1000
+    g._image_height = 800
+    g._corners = [(0, 0), (0, 800), (1000, 0), (1000, 800)]
+    return g
+
+
+def reference_channel_to_signal(points, ignore_ssids):
+    """the original dict-of-lists implementation of _channel_to_signal"""
+    channels = defaultdict(list)
+    for row in points:
+        for scan in row['result']['scan_results'].values():
+            if scan['ssid'] in ignore_ssids:
+                continue
+            freq = scan['frequency'] / 1e6
+            channels[int(freq)].append(scan['signal_mbm'] + 100)
+    for freq in channels.keys():
+        channels[freq] = sum(channels[freq]) / len(channels[freq])
+    freq_qual = {x: 0.0 for x in WIFI_CHANNELS.keys()}
+    for freq, qual in channels.items():
+        freq_qual[freq] += qual
+        for spread in range(
+            int(freq - (WIFI_CHANNELS[freq][1] / 2.0)),
+            int(freq + (WIFI_CHANNELS[freq][1] / 2.0) + 1.0)
+        ):
+            if spread in freq_qual and spread != freq:
+                freq_qual[spread] += qual
+    return {WIFI_CHANNELS[x][0]: freq_qual[x] for x in freq_qual.keys()}
+
+
+class TestChannelToSignal(object):
+
+    def test_matches_reference(self, tmp_path):
+        rand = random.Random(42)
+        freqs = list(WIFI_CHANNELS.keys())
+        points = []
+        for i in range(30):
+            scans = {
+                'bssid%d' % j: {
+                    'ssid': rand.choice(['home', 'guest', 'neighbor']),
+                    'frequency': rand.choice(freqs) * 1e6,
+                    'signal_mbm': rand.randint(-90, -30),
+                }
+                for j in range(8)
+            }
+            points.append(survey_point(i * 10, i * 5, scans))
+        g = generator(tmp_path, points, ignore_ssids=['neighbor'])
+        expected = reference_channel_to_signal(points, ['neighbor'])
+        result = g._channel_to_signal()
+        assert list(result.keys()) == list(expected.keys())
+        for ch, qual in expected.items():
+            assert result[ch] == pytest.approx(qual, abs=1e-4)
+
+    def test_unknown_frequency(self, tmp_path):
+        scans = {
+            'a': {'ssid': 'x', 'frequency': 2412e6, 'signal_mbm': -50},
+            'b': {'ssid': 'x', 'frequency': 5955e6, 'signal_mbm': -50},
+        }
+        g = generator(tmp_path, [survey_point(1, 1, scans)])
+        with pytest.raises(KeyError, match='5955'):
+            g._channel_to_signal()
+
+    def test_unknown_frequency_ignored_ssid(self, tmp_path):
+        scans = {
+            'a': {'ssid': 'x', 'frequency': 2412e6, 'signal_mbm': -50},
+            'b': {'ssid': 'y', 'frequency': 5955e6, 'signal_mbm': -50},
+        }
+        g = generator(
+            tmp_path, [survey_point(1, 1, scans)], ignore_ssids=['y']
+        )
+        result = g._channel_to_signal()
+        assert result[1] == 50.0
+        assert result[36] == 0.0
+
+
+class TestLoadData(object):
+
+    def test_load_data(self, tmp_path):
+        points = [
+            survey_point(
+                10, 20, tcp={'received_Mbps': 50.0},
+                udp={'Mbps': 10.0, 'jitter_ms': 1.0}, tx_power=None
+            ),
+            survey_point(30, 40, udp={'Mbps': 20.0, 'jitter_ms': 2.0}),
+            # duplicate point is discarded
+            survey_point(30, 40, udp={'Mbps': 99.0, 'jitter_ms': 9.0}),
+        ]
+        a = generator(tmp_path, points).load_data()
+        assert a['x'].tolist() == [10.0, 30.0]
+        assert a['y'].tolist() == [20.0, 40.0]
+        assert a['udp_download_Mbps'].tolist() == [10.0, 20.0]
+        # None values become 0
+        assert a['tx_power'].tolist() == [0.0, 20.0]
+        # metric with holes only keeps its present values
+        assert a['tcp_upload_Mbps'].tolist() == [50.0]
+        # metrics missing from every point are omitted
+        assert 'channel_bitrate' not in a
+        assert 'tcp_download_Mbps' not in a
+        assert a['ap'] == ['aa:bb:cc:dd:ee:ff (2.4 GHz)'] * 2
+
+
+class TestInterpolate(object):
+
+    def test_survey_point_at_corner(self, tmp_path):
+        rand = random.Random(3)
+        points = [survey_point(0, 0, tx_power=5)] + [
+            survey_point(
+                rand.randint(1, 999), rand.randint(1, 799),
+                tx_power=rand.randint(0, 20)
+            )
+            for _ in range(10)
+        ]
+        g = generator(tmp_path, points)
+        a = g._pad_corners(g.load_data())
+        # (0, 0) is surveyed, so only the other three corners are padded
+        assert g._corners == [(0, 800), (1000, 0), (1000, 800)]
+        assert len(a['x']) == len(a['tx_power']) == 14
+        eval_pts = np.array([[0.0, 0.0], [500.0, 400.0], [1000.0, 800.0]])
+        res = g._interpolate(a, eval_pts, 3, 1)
+        assert res['tx_power'].shape == (1, 3)
+        assert res['tx_power'].dtype == np.float32
+        assert res['tx_power'][0, 0] == pytest.approx(5, abs=1e-3)
+        assert np.isfinite(res['tx_power']).all()
+
+
+class TestHeatmaps(object):
+
+    def test_holes_not_plottable(self, tmp_path):
+        points = [
+            survey_point(10, 20, tcp={'received_Mbps': 50.0}),
+            survey_point(30, 40),
+        ]
+        g = generator(tmp_path, points)
+        a = g.load_data()
+        assert g._plottable(a, 'tx_power') is True
+        assert g._plottable(a, 'tcp_upload_Mbps') is False
+        assert g._plottable(a, 'channel_bitrate') is False
+
+    def test_getstate(self, tmp_path):
+        g = generator(tmp_path, [survey_point(10, 20)])
+        g._layout = np.zeros((800, 1000, 3), dtype=np.uint8)
+        g._background = np.zeros((80, 100, 3), dtype=np.uint8)
+        state = g.__getstate__()
+        assert state['_data'] is None
+        assert state['_layout'] is None
+        assert state['_figure'] is None
+        assert state['_background'] is g._background
+        assert g._data is not None
+
+    def test_init_plot_worker(self, tmp_path):
+        g = generator(tmp_path, [survey_point(10, 20)])
+        handler = heatmap.logger.handlers[0]
+        old_level = heatmap.logger.level
+        old_formatter = handler.formatter
+        try:
+            heatmap._init_plot_worker(g, logging.DEBUG, 'foo %(message)s')
+            assert heatmap.logger.level == logging.DEBUG
+            assert handler.formatter._fmt == 'foo %(message)s'
+        finally:
+            heatmap.logger.setLevel(old_level)
+            handler.setFormatter(old_formatter)
+        assert heatmap._worker_generator is g
+        assert tuple(g._figure.get_size_inches()) == (1000 / 300, 800 / 300)
+
+    def test_heatmaps(self, tmp_path, monkeypatch):
+        rand = random.Random(4)
+        points = [
+            survey_point(
+                rand.randint(1, 999), rand.randint(1, 799),
+                tx_power=rand.randint(0, 20),
+                signal_mbm=rand.randint(-9000, -3000)
+            )
+            for i in range(10)
+        ]
+        # tcp_upload_Mbps has a hole, so is not plotted
+        for point in points[1:]:
+            point['result']['tcp'] = {'received_Mbps': 50.0}
+        g = generator(tmp_path, points)
+        monkeypatch.chdir(tmp_path)
+        g._title = 'survey.json'
+        g._layout = np.zeros((800, 1000, 3), dtype=np.uint8)
+        g._background = np.zeros((80, 100, 3), dtype=np.uint8)
+        g._heatmaps(g._pad_corners(g.load_data()))
+        assert sorted(p.name for p in tmp_path.glob('*.png')) == [
+            'channel_survey.json.png',
+            'frequency_survey.json.png',
+            'signal_quality_survey.json.png',
+            'tx_power_survey.json.png',
+        ]
+
+
+class TestLoadImage(object):
+
+    def test_png(self, tmp_path):
+        fpath = tmp_path / 'floorplan.png'
+        Image.new('RGB', (300, 200), (10, 20, 30)).save(fpath)
+        g = generator(tmp_path, [survey_point(10, 20)])
+        g._image_path = str(fpath)
+        g._load_image()
+        assert g._image_width == 300
+        assert g._image_height == 200
+        assert g._layout.shape == (200, 300, 3)
+        assert g._layout.dtype == np.uint8
+        assert g._layout[0, 0].tolist() == [10, 20, 30]
+        assert g._corners == [(0, 0), (0, 200), (300, 0), (300, 200)]
+
+    def test_grayscale_converted(self, tmp_path):
+        fpath = tmp_path / 'floorplan.png'
+        Image.new('L', (300, 200), 128).save(fpath)
+        g = generator(tmp_path, [survey_point(10, 20)])
+        g._image_path = str(fpath)
+        g._load_image()
+        assert g._layout.shape == (200, 300, 4)
+        assert g._layout[0, 0].tolist() == [128, 128, 128, 255]
+
+    def test_jpeg_draft(self, tmp_path):
+        fpath = tmp_path / 'floorplan.jpg'
+        Image.new('RGB', (800, 400), (255, 255, 255)).save(fpath)
+        g = generator(tmp_path, [survey_point(10, 20)])
+        g._image_path = str(fpath)
+        with patch.object(g, '_plot_fraction', return_value=0.25):
+            g._load_image()
+        # coordinates stay in full-size pixels; JPEG decoded at 1/4 scale
+        assert g._image_width == 800
+        assert g._image_height == 400
+        assert g._layout.shape == (100, 200, 3)
+
+
+class TestResampleLayout(object):
+
+    def test_downsamples_to_plot_area(self, tmp_path):
+        g = generator(tmp_path, [survey_point(10, 20)])
+        g._layout = np.full((800, 1000, 3), 200, dtype=np.uint8)
+        with patch.object(g, '_plot_fraction', return_value=0.5):
+            bg = g._resample_layout()
+        assert bg.shape == (400, 500, 3)
+        assert bg.dtype == np.uint8
+        assert (bg == 200).all()
+
+    def test_already_small(self, tmp_path):
+        g = generator(tmp_path, [survey_point(10, 20)])
+        # e.g. a JPEG draft-decoded below the plot area size
+        g._layout = np.zeros((200, 250, 4), dtype=np.uint8)
+        with patch.object(g, '_plot_fraction', return_value=0.5):
+            assert g._resample_layout() is g._layout